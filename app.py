@@ -1,3 +1,5 @@
+import os
+
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
@@ -13,8 +15,8 @@ st.set_page_config(
 )
 
 
-st.markdown(
-    """
+# Styling + fixed top bar, bound once at import and emitted with a single call
+TOPBAR_HTML = """
     <style>
       div[data-testid="stTabs"] hr {
         display: none !important;
@@ -108,9 +110,9 @@ st.markdown(
     <div class="custom-topbar">
       <div class="title">⚡ Aluminium Production — Cost Model</div>
     </div>
-    """,
-    unsafe_allow_html=True
-)
+    """
+
+st.markdown(TOPBAR_HTML, unsafe_allow_html=True)
 
 
 
@@ -118,34 +120,16 @@ st.markdown(
 # =================================================
 # Data loading
 # =================================================
-country_df = pd.read_csv("data/country_electricity_mix.csv")
-electricity_df = pd.read_csv("data/electricity_price_co2.csv")
-
-# NEW material cost files
-alumina_df = pd.read_csv("data/alumina_costs.csv")
-petcoke_df = pd.read_csv("data/calc_petcoke_costs.csv")
-
-# Sustainability / trade-based CO2 dataset (the one you just uploaded)
-sustainability_df = pd.read_csv("data/total_co2_tot_Al.csv")
-
-# Drop empty rows (same as notebook)
-sustainability_df = sustainability_df.dropna(how="all")
-
-# Clean numeric columns exactly like your notebook logic (remove commas, coerce, fill 0)
-for col in [
-    "Bauxite_tonnes_m", "Bauxite_tonnes_x", "Bauxite_local_tonnes",
-    "Alumina_tonnes_m", "Alumina_tonnes_x"
-]:
-    if col in sustainability_df.columns:
-        sustainability_df[col] = (
-            sustainability_df[col]
-            .astype(str)
-            .str.replace(",", "", regex=True)
-        )
-        sustainability_df[col] = pd.to_numeric(sustainability_df[col], errors="coerce").fillna(0)
+DATA_FILES = (
+    "data/country_electricity_mix.csv",
+    "data/electricity_price_co2.csv",
+    "data/alumina_costs.csv",
+    "data/calc_petcoke_costs.csv",
+    "data/total_co2_tot_Al.csv",
+)
 
-# Clean country-name fields in sustainability_df (prevents mismatch due to trailing spaces)
-country_cols = [
+# Country-name columns of the trade table (total_co2_tot_Al.csv)
+TRADE_COUNTRY_COLS = [
     "Bauxite_destination_m",
     "Bauxite_destination_x",
     "Bauxite_local_country",
@@ -154,13 +138,108 @@ country_cols = [
     "country1",
     "country2",
 ]
-for col in country_cols:
-    if col in sustainability_df.columns:
-        sustainability_df[col] = sustainability_df[col].astype(str).str.strip()
 
-# Clean country names
-for df in [country_df, electricity_df, alumina_df, petcoke_df]:
-    df["country"] = df["country"].str.strip()
+
+def current_data_version():
+    # File mtimes, passed to every cached data/model function so editing a CSV
+    # invalidates the cached tables and results without restarting the app
+    return tuple(os.path.getmtime(path) for path in DATA_FILES)
+
+
+@st.cache_data(max_entries=1)
+def load_all(data_version):
+    # Only the columns the model reads, with numeric dtypes fixed up front so the
+    # parser skips type inference (tonnages exceed float32 precision, keep float64).
+    # The plain tables go through pyarrow's multithreaded reader.
+    country_df = pd.read_csv(
+        "data/country_electricity_mix.csv",
+        engine="pyarrow",
+        usecols=["country", "energy_kwh_per_t", "labour_cost_eur_per_t"],
+        dtype={"energy_kwh_per_t": "float64", "labour_cost_eur_per_t": "float64"},
+    )
+    electricity_df = pd.read_csv(
+        "data/electricity_price_co2.csv",
+        engine="pyarrow",
+        usecols=["country", "avg_electricity_price_eur_per_kwh", "avg_co2_kg_per_kwh"],
+        dtype={"avg_electricity_price_eur_per_kwh": "float64", "avg_co2_kg_per_kwh": "float64"},
+    )
+
+    # NEW material cost files
+    alumina_df = pd.read_csv(
+        "data/alumina_costs.csv",
+        engine="pyarrow",
+        dtype={"alumina_market_price_eur_per_t": "float64", "alumina_transport_cost_eur_per_t": "float64"},
+    )
+    petcoke_df = pd.read_csv(
+        "data/calc_petcoke_costs.csv",
+        engine="pyarrow",
+        dtype={"petcoke_market_price_eur_per_t": "float64", "petcoke_transport_cost_eur_per_t": "float64"},
+    )
+
+    # Sustainability / trade-based CO2 dataset (the one you just uploaded)
+    # thousands="," lets the C parser strip the comma separators while reading
+    # (pyarrow's engine has no thousands option, so this one stays on C);
+    # the *_source_* columns are never used by the model, so they are not parsed
+    sustainability_df = pd.read_csv(
+        "data/total_co2_tot_Al.csv",
+        thousands=",",
+        usecols=[
+            "Bauxite_destination_m", "Bauxite_tonnes_m",
+            "Bauxite_destination_x", "Bauxite_tonnes_x",
+            "Bauxite_local_country", "Bauxite_local_tonnes",
+            "Alumina_destination_m", "Alumina_tonnes_m",
+            "Alumina_destination_x", "Alumina_tonnes_x",
+            "country1", "avg_co2_kg_per_kwh",
+            "country2", "energy_kwh_per_t",
+        ],
+        dtype={
+            "Bauxite_tonnes_m": "float64",
+            "Bauxite_tonnes_x": "float64",
+            "Bauxite_local_tonnes": "float64",
+            "Alumina_tonnes_m": "float64",
+            "Alumina_tonnes_x": "float64",
+            "avg_co2_kg_per_kwh": "float64",
+            "energy_kwh_per_t": "float64",
+        },
+    )
+
+    # Drop empty rows (same as notebook) and zero-fill the tonnages in one chained pass;
+    # read_csv already parsed them as float64, so no per-column to_numeric coercion
+    tonnes_cols = [
+        "Bauxite_tonnes_m", "Bauxite_tonnes_x", "Bauxite_local_tonnes",
+        "Alumina_tonnes_m", "Alumina_tonnes_x"
+    ]
+    sustainability_df = sustainability_df.dropna(how="all").fillna(dict.fromkeys(tonnes_cols, 0))
+
+    # Clean country-name fields in sustainability_df (prevents mismatch due to trailing spaces)
+    sustainability_df[TRADE_COUNTRY_COLS] = sustainability_df[TRADE_COUNTRY_COLS].astype(str).apply(lambda s: s.str.strip())
+
+    # Drop rows with a blank country cell (they can never match a country), then clean country names
+    country_df, electricity_df, alumina_df, petcoke_df = (
+        df.dropna(subset=["country"]) for df in [country_df, electricity_df, alumina_df, petcoke_df]
+    )
+    for df in [country_df, electricity_df, alumina_df, petcoke_df]:
+        df["country"] = df["country"].str.strip()
+
+    # One shared categorical dtype for every country-name column, so groupby/join
+    # hash small integer codes instead of the repeated country strings
+    country_dtype = pd.CategoricalDtype(
+        sorted(
+            set().union(
+                *(df["country"] for df in [country_df, electricity_df, alumina_df, petcoke_df]),
+                *(sustainability_df[col] for col in TRADE_COUNTRY_COLS),
+            )
+        )
+    )
+    for df in [country_df, electricity_df, alumina_df, petcoke_df]:
+        df["country"] = df["country"].astype(country_dtype)
+    for col in TRADE_COUNTRY_COLS:
+        sustainability_df[col] = sustainability_df[col].astype(country_dtype)
+
+    return country_df, electricity_df, alumina_df, petcoke_df, sustainability_df
+
+
+data_version = current_data_version()
 
 # =================================================
 # Sidebar (global parameters only)
@@ -210,105 +289,102 @@ with st.sidebar:
 
 
 # =================================================
-# Countries — AUTOMATIC (ALL)
+# Countries — AUTOMATIC (ALL with every required dataset)
 # =================================================
-countries_selected = sorted(country_df["country"].unique())
+# Hashed set intersection instead of per-country `in df["country"].values` scans,
+# cached as a sorted tuple so reruns reuse it instead of re-sorting
+@st.cache_data(max_entries=1)
+def load_countries(data_version):
+    country_df, electricity_df, alumina_df, petcoke_df, _ = load_all(data_version)
+    return tuple(sorted(
+        set(country_df["country"])
+        & set(electricity_df["country"])
+        & set(alumina_df["country"])
+        & set(petcoke_df["country"])
+    ))
+
+
+countries_selected = load_countries(data_version)
+
+# ---- EXACT CONSTANTS FROM YOUR CODE ----
+# Module-level so they are bound once, not on every model call
+BAUXITE_GRADE = 0.5  # fraction of alumina from local bauxite
+
+STOCHIOMETRIC_AL = 1.889  # tAl2O3/t Al
+STOCHIOMETRIC_C = 0.333   # tC/ t Al
+STOCHIOMETRIC_CO2 = 1.222 # tCO2 / tAl
+
+FUEL_OIL_ALUMINA = 0.093      # kg fuel oil / kg alumina
+FUEL_OIL_CO2 = 3.52           # kg CO2 / kg fuel oil
+NATURAL_GAS_ALUMINA = 0.17    # kg natural gas / kg alumina
+NATURAL_GAS_CO2 = 1.98        # kg CO2 / kg natural gas
+# Fuel-oil + natural-gas CO2 of refining, folded once (kg CO2 / kg alumina)
+ALUMINA_FOSSIL_CO2 = FUEL_OIL_ALUMINA * FUEL_OIL_CO2 + NATURAL_GAS_ALUMINA * NATURAL_GAS_CO2
+ENERGY_ALUMINA = 0.109        # kWh/ kg alumina
+
+ANODE_FOOTPRINT = 1.5 # t CO2 / t Al
 
 ##################################################################################################
 def compute_total_co2_intensity_from_trade(
     df,
-    country_name,
+    countries,
     current_efficiency=0.9,
     bauxite_footprint=0.035,
     voltage_cell=4.64,
 ):
 
-    # ---- EXACT CONSTANTS FROM YOUR CODE ----
-    bauxite_grade = 0.5  # fraction of alumina from local bauxite
-    #current_efficiency = 0.9  # CE
-
-    stochiometric_al = 1.889  # tAl2O3/t Al
-    stochiometric_c = 0.333   # tC/ t Al
-    stochiometric_co2 = 1.222 # tCO2 / tAl
-
-    #bauxite_footprint = 0.035 # tCO2/t bauxite
-
-    fuel_oil_alumina = 0.093      # kg fuel oil / kg alumina
-    fuel_oil_co2 = 3.52           # kg CO2 / kg fuel oil
-    natural_gas_alumina = 0.17    # kg natural gas / kg alumina
-    natural_gas_co2 = 1.98        # kg CO2 / kg natural gas
-    energy_alumina = 0.109        # kWh/ kg alumina
-
-    #voltage_cell = 4.64  # V
-    anode_footprint = 1.5 # t CO2 / t Al
-
-    # ---- EXACT LOGIC FROM YOUR CODE (just organized) ----
-    def total_bauxite_for_country(country_name):
-        imports = df.loc[df['Bauxite_destination_m'] == country_name, 'Bauxite_tonnes_m'].sum() / 1000  # kg → t
-        exports = df.loc[df['Bauxite_destination_x'] == country_name, 'Bauxite_tonnes_x'].sum() / 1000  # kg → t
-        domestic = df.loc[df['Bauxite_local_country'] == country_name, 'Bauxite_local_tonnes'].sum() * 1000  # 1000 t → t
-        total = imports + domestic - exports
-        return total / 1e6  # tonnes (Mtonnes-style scaling as in code)
-
-    def total_alumina_for_country(country_name):
-        imports = df.loc[df['Alumina_destination_m'] == country_name, 'Alumina_tonnes_m'].sum() / 1000  # kg → t
-        exports = df.loc[df['Alumina_destination_x'] == country_name, 'Alumina_tonnes_x'].sum() / 1000  # kg → t
-        total = imports - exports
-        return total / 1e6  # tonnes
+    # ---- EXACT LOGIC FROM YOUR CODE (vectorized over all countries) ----
+    # Keep only rows that mention a requested country in some flow column, so the
+    # groupbys below scan just that subset (categorical isin compares integer codes)
+    df = df[df[TRADE_COUNTRY_COLS].isin(countries).any(axis=1)]
 
-    def electricity_footprint_per_country(country_name):
-        electricity_footprint = df.loc[df['country1'] == country_name, 'avg_co2_kg_per_kwh'].sum()
-        return electricity_footprint
+    # One groupby pass per flow column instead of a boolean scan per country
+    def total_by_country(country_col, value_col):
+        return df.groupby(country_col, observed=True)[value_col].sum().reindex(countries, fill_value=0)
 
-    def energy_intensity_per_country(country_name):
-        energy_intensity = df.loc[df['country2'] == country_name, 'energy_kwh_per_t'].sum() / 1000
-        return energy_intensity
+    bauxite_imports = total_by_country('Bauxite_destination_m', 'Bauxite_tonnes_m') / 1000  # kg → t
+    bauxite_exports = total_by_country('Bauxite_destination_x', 'Bauxite_tonnes_x') / 1000  # kg → t
+    bauxite_domestic = total_by_country('Bauxite_local_country', 'Bauxite_local_tonnes') * 1000  # 1000 t → t
+    total_bauxite = (bauxite_imports + bauxite_domestic - bauxite_exports) / 1e6  # tonnes (Mtonnes-style scaling as in code)
 
-    total_bauxite = total_bauxite_for_country(country_name)
-    total_alumina = total_bauxite * bauxite_grade + total_alumina_for_country(country_name)
+    alumina_imports = total_by_country('Alumina_destination_m', 'Alumina_tonnes_m') / 1000  # kg → t
+    alumina_exports = total_by_country('Alumina_destination_x', 'Alumina_tonnes_x') / 1000  # kg → t
+    total_alumina = total_bauxite * BAUXITE_GRADE + (alumina_imports - alumina_exports) / 1e6  # tonnes
 
-    total_al = total_alumina / stochiometric_al * current_efficiency
-    total_c = total_al * stochiometric_c / current_efficiency
-    total_reaction_co2 = total_al * stochiometric_co2 / current_efficiency
+    total_al = total_alumina / STOCHIOMETRIC_AL * current_efficiency
+    total_reaction_co2 = total_al * STOCHIOMETRIC_CO2 / current_efficiency
 
     bauxite_co2 = bauxite_footprint * total_bauxite
 
-    energy_co2 = electricity_footprint_per_country(country_name)  # kg CO2 / kWh
+    energy_co2 = total_by_country('country1', 'avg_co2_kg_per_kwh')  # kg CO2 / kWh
 
     alumina_co2 = (
-        (fuel_oil_alumina * fuel_oil_co2 + natural_gas_alumina * natural_gas_co2 + energy_alumina * energy_co2)
+        (ALUMINA_FOSSIL_CO2 + ENERGY_ALUMINA * energy_co2)
         * total_alumina
     )
 
     energy_hh_mode_1 = 2.9806 * voltage_cell / current_efficiency # MWh / t Al
-    energy_hh_mode_2 = energy_intensity_per_country(country_name) # MWh / t Al
+    energy_hh_mode_2 = total_by_country('country2', 'energy_kwh_per_t') / 1000 # MWh / t Al
 
-    total_energy_co2_mode_1 = energy_co2 * energy_hh_mode_1 * total_al
-    total_energy_co2_mode_2 = energy_co2 * energy_hh_mode_2 * total_al
+    # Only the average of the two electricity modes is consumed downstream, so average
+    # the smelter energy first: one energy-CO2 term instead of two full totals
+    energy_hh_avg = (energy_hh_mode_1 + energy_hh_mode_2) / 2
+    total_energy_co2_avg = energy_co2 * energy_hh_avg * total_al
 
-    anode_co2 = anode_footprint * total_al
+    anode_co2 = ANODE_FOOTPRINT * total_al
 
-    total_co2_mode_1 = total_reaction_co2 + bauxite_co2 + alumina_co2 + total_energy_co2_mode_1 + anode_co2
-    total_co2_mode_2 = total_reaction_co2 + bauxite_co2 + alumina_co2 + total_energy_co2_mode_2 + anode_co2
+    total_co2_avg = total_reaction_co2 + bauxite_co2 + alumina_co2 + total_energy_co2_avg + anode_co2
 
-    functional_unit_mode_1 = total_co2_mode_1 / total_al
-    functional_unit_mode_2 = total_co2_mode_2 / total_al
-
-    functional_unit_avg = (functional_unit_mode_1 + functional_unit_mode_2) / 2
+    functional_unit_avg = total_co2_avg / total_al
     # --- component intensities (tCO2/t Al) ---
-    # Electricity is computed in two modes; keep both + average
-    elec_intensity_mode_1 = total_energy_co2_mode_1 / total_al
-    elec_intensity_mode_2 = total_energy_co2_mode_2 / total_al
-    elec_intensity_avg = (elec_intensity_mode_1 + elec_intensity_mode_2) / 2
+    elec_intensity_avg = total_energy_co2_avg / total_al
 
     reaction_intensity = total_reaction_co2 / total_al
     bauxite_intensity = bauxite_co2 / total_al
     anode_intensity = anode_co2 / total_al
 
-    return {
+    return pd.DataFrame({
         "Functional_unit": functional_unit_avg,  # as in code
-        "functional_unit_mode_1": functional_unit_mode_1,
-        "functional_unit_mode_2": functional_unit_mode_2,
         "total_al": total_al,
         "total_alumina": total_alumina,
         "total_bauxite": total_bauxite,
@@ -318,80 +394,94 @@ def compute_total_co2_intensity_from_trade(
         "bauxite_tco2_per_tal": bauxite_intensity,
         "anode_tco2_per_tal": anode_intensity,
         "reaction_tco2_per_tal": reaction_intensity,
-    }
+    })
 
 # =================================================
 # Core model calculations (AUTOMATED MODE ONLY)
 # =================================================
-results = []
+@st.cache_data(max_entries=1)
+def load_country_inputs(countries, data_version):
+    # Scenario-independent: re-joined only when the country set changes
+    country_df, electricity_df, alumina_df, petcoke_df, _ = load_all(data_version)
+
+    # One indexed inner join instead of a boolean-mask lookup per country per table.
+    # Countries missing any required dataset drop out of the join; validate= raises
+    # on a duplicated country row instead of silently fanning out the results.
+    return (
+        country_df.set_index("country")
+        .loc[list(countries)]
+        .join(electricity_df.set_index("country"), how="inner", validate="one_to_one")
+        .join(alumina_df.set_index("country"), how="inner", validate="one_to_one")
+        .join(petcoke_df.set_index("country"), how="inner", validate="one_to_one")
+    )
+
+
+@st.cache_data(max_entries=32)
+def compute_co2(
+    countries,
+    current_efficiency,
+    bauxite_footprint,
+    voltage_cell,
+    data_version,
+):
+    # Cached apart from the cost step, so carbon tax / margin changes reuse the trade aggregation
+    sustainability_df = load_all(data_version)[4]
+
+    return compute_total_co2_intensity_from_trade(
+        sustainability_df,
+        list(countries),
+        current_efficiency=current_efficiency,
+        bauxite_footprint=bauxite_footprint,
+        voltage_cell=voltage_cell,
+    )
 
-for country in countries_selected:
 
-    # Skip countries missing required datasets
-    if (
-        country not in electricity_df["country"].values
-        or country not in alumina_df["country"].values
-        or country not in petcoke_df["country"].values
-    ):
-        continue
+@st.cache_data(max_entries=32)
+def compute_results(
+    countries,
+    carbon_tax,
+    margin_rate,
+    current_efficiency,
+    bauxite_footprint,
+    voltage_cell,
+    data_version,
+):
+    # Re-runs only when one of the scenario inputs above changes
+    co2_df = compute_co2(countries, current_efficiency, bauxite_footprint, voltage_cell, data_version)
+    merged = load_country_inputs(countries, data_version).join(co2_df, how="inner")
 
-    cdata = country_df[country_df["country"] == country].iloc[0]
-    edata = electricity_df[electricity_df["country"] == country].iloc[0]
+    # Skip countries without a usable trade-based CO2 result
+    merged = merged[merged["Functional_unit"].notna() & (merged["total_al"] != 0)]
 
     # Country-level parameters
-    E = cdata["energy_kwh_per_t"]
-    labour_cost = cdata["labour_cost_eur_per_t"]
+    E = merged["energy_kwh_per_t"]
+    labour_cost = merged["labour_cost_eur_per_t"]
 
-    electricity_price = edata["avg_electricity_price_eur_per_kwh"]
-    grid_co2_intensity = edata["avg_co2_kg_per_kwh"]
+    electricity_price = merged["avg_electricity_price_eur_per_kwh"]
+    grid_co2_intensity = merged["avg_co2_kg_per_kwh"]
 
-    # Electricity cost and emissions (electricity-only breakdown)
+    # Electricity cost (electricity-only breakdown)
     electricity_cost = E * electricity_price
-    electricity_co2 = (E * grid_co2_intensity)/1000 # t CO2 / t Al
 
     ############################################################################################################
-    # Total CO2 intensity from the sustainability dataset (trade-based) -> already INCLUDES electricity
-    co2_info = compute_total_co2_intensity_from_trade(
-        sustainability_df,
-        country,
-        current_efficiency=current_efficiency,
-        bauxite_footprint=bauxite_footprint,
-        voltage_cell=voltage_cell,
-    )
-
-    if (
-        co2_info is None
-        or co2_info.get("Functional_unit") is None
-        or pd.isna(co2_info.get("Functional_unit"))
-        or co2_info.get("total_al", 0) == 0
-    ):
-        continue
-
-    # TOTAL footprint from sustainability model (tCO2/tAl)
-    total_co2 = co2_info["Functional_unit"] 
+    # TOTAL footprint from sustainability model (tCO2/tAl) -> already INCLUDES electricity
+    total_co2 = merged["Functional_unit"]
     ##############################################################################################################
-    elec_co2_int = co2_info["elec_tco2_per_tal"]
-    bauxite_co2_int = co2_info["bauxite_tco2_per_tal"]
-    anode_co2_int = co2_info["anode_tco2_per_tal"]
-    reaction_co2_int = co2_info["reaction_tco2_per_tal"]
 
     # =================================================
     # NEW MATERIAL COST LOGIC
     # =================================================
-    alumina_row = alumina_df[alumina_df["country"] == country].iloc[0]
-    petcoke_row = petcoke_df[petcoke_df["country"] == country].iloc[0]
-
     alumina_cost = (
-        alumina_row["alumina_market_price_eur_per_t"]
-        + alumina_row["alumina_transport_cost_eur_per_t"]
+        merged["alumina_market_price_eur_per_t"]
+        + merged["alumina_transport_cost_eur_per_t"]
     )
 
     petcoke_cost = (
-        petcoke_row["petcoke_market_price_eur_per_t"]
-        + petcoke_row["petcoke_transport_cost_eur_per_t"]
+        merged["petcoke_market_price_eur_per_t"]
+        + merged["petcoke_transport_cost_eur_per_t"]
     )
 
-    material_cost = ((alumina_cost*1.889) + (petcoke_cost*0.333))/current_efficiency
+    material_cost = ((alumina_cost*STOCHIOMETRIC_AL) + (petcoke_cost*STOCHIOMETRIC_C))/current_efficiency
 
     # Carbon cost (use TOTAL CO2 only; no double counting)
     carbon_cost = total_co2 * carbon_tax
@@ -401,8 +491,8 @@ for country in countries_selected:
     margin_cost = operational_cost * margin_rate
     total_cost = operational_cost + margin_cost + carbon_cost
 
-    results.append({
-        "Country": country,
+    df = pd.DataFrame({
+        "Country": merged.index,
         "Electricity price (€/kWh)": electricity_price,
         "Electricity CO₂ footprint (kgCO₂/kWh)": grid_co2_intensity,
         "Electricity cost (€/t)": electricity_cost,
@@ -418,17 +508,41 @@ for country in countries_selected:
         # Optional but useful breakdown column (electricity-only)
         #"Electricity CO₂  (tCO₂/t Al)": electricity_co2,
 
-        "Electricity CO₂  (tCO₂/t Al)": elec_co2_int,
-        "CO₂ bauxite (tCO₂/t Al)": bauxite_co2_int,
-        "CO₂ anode (tCO₂/t Al)": anode_co2_int,
-        "CO₂ reaction (tCO₂/t Al)": reaction_co2_int,
-        "Total Al (t)": co2_info["total_al"],   # total tonnes of aluminium (already in the function)
+        "Electricity CO₂  (tCO₂/t Al)": merged["elec_tco2_per_tal"],
+        "CO₂ bauxite (tCO₂/t Al)": merged["bauxite_tco2_per_tal"],
+        "CO₂ anode (tCO₂/t Al)": merged["anode_tco2_per_tal"],
+        "CO₂ reaction (tCO₂/t Al)": merged["reaction_tco2_per_tal"],
+        "Total Al (t)": merged["total_al"],   # total tonnes of aluminium (already in the function)
+        "Total CO₂ (t)": total_co2 * merged["total_al"],
+    }).reset_index(drop=True)
+
+    return df
+
+
+scenario_key = (
+    countries_selected,
+    carbon_tax,
+    margin_rate,
+    current_efficiency,
+    bauxite_footprint,
+    voltage_cell,
+    data_version,
+)
 
-    })
+# Reruns with unchanged inputs (tab switches, pie selection) reuse this session's
+# frame instead of re-hashing the arguments and unpickling a cached copy
+if st.session_state.get("scenario_key") != scenario_key:
+    st.session_state["scenario_key"] = scenario_key
+    st.session_state["results_df"] = compute_results(*scenario_key)
+    # Rounded display copy, materialized once per scenario rather than on every rerun
+    st.session_state["results_display_df"] = st.session_state["results_df"].round(2)
 
-df = pd.DataFrame(results)
+df = st.session_state["results_df"]
 
-df["Total CO₂ (t)"] = df["Total CO₂ footprint  (tCO₂/t Al)"] * df["Total Al (t)"]
+# Nothing to chart (no country with complete data); the pie lookup below would fail
+if df.empty:
+    st.warning("No country has complete cost and trade-based CO₂ data.")
+    st.stop()
 
 # =================================================
 # Visual styling
@@ -439,27 +553,109 @@ PALETTE = (
     + pc.qualitative.Alphabet
 )
 
-country_colors = {
-    c: PALETTE[i % len(PALETTE)] for i, c in enumerate(countries_selected)
+@st.cache_data
+def build_colors(countries):
+    return {c: PALETTE[i % len(PALETTE)] for i, c in enumerate(countries)}
+
+
+country_colors = build_colors(countries_selected)
+
+
+# Shared layouts built once at import and passed straight to go.Figure,
+# instead of an update_layout merge on every figure build
+SCATTER_LAYOUT = {
+    "hovermode": "closest",
+    "height": 555,
+    "legend": {
+        "orientation": "v",
+        "yanchor": "top",
+        "y": 1.0,
+        "xanchor": "left",
+        "x": 1.02,
+        "font": {"size": 7},
+    },
 }
 
-# =================================================
-# Layout — tabs
-# =================================================
-tab_map, tab_scenario, tab_costs = st.tabs(
-    ["🌍 Global map", "⚙️ Scenario outcomes", "💰 Cost structure"]
-)
+COST_STACK_LAYOUT = {
+    "barmode": "stack",
+    "margin": {"r": 0, "t": 20, "l": 0, "b": 0},
+    "yaxis": {"title": {"text": "€/t aluminium"}},
+    "xaxis": {"title": {"text": "Country"}},
+}
 
-# =================================================
-# TAB — Global map
-# =================================================
-with tab_map:
-    st.markdown(
-        "<h3 style='font-size:1.25rem; margin:0 0 0.2rem 0;'>"
-        "Global overview of aluminium production metrics"
-        "</h3>",
-        unsafe_allow_html=True
+# Dark background + geo styling for the choropleth, applied in one update_layout
+MAP_LAYOUT = {
+    "paper_bgcolor": "#0e1117",
+    "plot_bgcolor": "#0e1117",
+    "geo": {
+        "bgcolor": "#0e1117",
+        "showcountries": True,
+        "countrycolor": "#2a2f3a",
+        "showcoastlines": True,
+        "coastlinecolor": "#3a3f4b",
+        "coastlinewidth": 0.6,
+        "showframe": False,
+        "projection": {"type": "natural earth"},
+    },
+    "margin": {"r": 0, "t": 0, "l": 0, "b": 0},
+    "coloraxis": {"colorbar": {"title": {"text": "€/t aluminium"}}},
+}
+
+
+def country_scatter(df, x, y, title, marker_size):
+    # Key the cached build on just the plotted columns and the colour map, like the
+    # map/cost builders, so e.g. a carbon-tax change does not rebuild fig1/fig4
+    return build_scatter(df[["Country", x, y]], x, y, title, marker_size, country_colors)
+
+
+@st.cache_data
+def build_scatter(df, x, y, title, marker_size, colors):
+    # One named WebGL trace per country, so the legend maps each colour to its country.
+    # Cached so reruns that leave the plotted columns untouched (e.g. the pie selectbox) reuse the figure
+    fig = go.Figure(
+        [
+            go.Scattergl(
+                x=group[x],
+                y=group[y],
+                mode="markers",
+                name=country,
+                marker=dict(
+                    color=colors[country],
+                    opacity=1.0,
+                    size=marker_size,
+                ),
+                hovertemplate=(
+                    "<b>%{fullData.name}</b><br>"
+                    f"{x}=%{{x}}<br>"
+                    f"{y}=%{{y}}"
+                    "<extra></extra>"
+                ),
+            )
+            for country, group in df.groupby("Country", sort=False, observed=True)
+        ],
+        layout={
+            **SCATTER_LAYOUT,
+            "title": {"text": title},
+            "xaxis": {"title": {"text": x}},
+            "yaxis": {"title": {"text": y}},
+        },
     )
+    return fig
+
+MAP_COLS = [
+    "Country",
+    "Total cost (€/t)",
+    "Electricity price (€/kWh)",
+    "Total CO₂ footprint  (tCO₂/t Al)",
+    "Electricity CO₂  (tCO₂/t Al)",
+]
+
+
+@st.cache_data
+def build_choropleth(df):
+    # Cache the figure itself: the choropleth build is the expensive step on rerun
+    # Both colour-range bounds from one agg call (NaN-skipping, like Series.min/max)
+    cost_min, cost_max = df["Total cost (€/t)"].agg(["min", "max"])
 
     fig_map = px.choropleth(
         df,
@@ -467,7 +663,7 @@ with tab_map:
         locationmode="country names",
         color="Total cost (€/t)",
         color_continuous_scale="Viridis",
-        range_color=(df["Total cost (€/t)"].min(), df["Total cost (€/t)"].max()),
+        range_color=(cost_min, cost_max),
         hover_name="Country",
         hover_data={
             "Total cost (€/t)": ":.1f",
@@ -477,26 +673,47 @@ with tab_map:
         },
         #title="Total aluminium production cost by country",
     )
-    fig_map.update_layout(
-        paper_bgcolor="#0e1117",
-        plot_bgcolor="#0e1117",
-    )
-    fig_map.update_geos(
-        bgcolor="#0e1117",
-        showcountries=True,
-        countrycolor="#2a2f3a",
-        showcoastlines=True,
-        coastlinecolor="#3a3f4b",
-        coastlinewidth=0.6,
-        showframe=False,
-        projection_type="natural earth",
+    fig_map.update_layout(MAP_LAYOUT)
+
+    return fig_map
+
+
+COST_COLS = [
+    "Electricity cost (€/t)",
+    "Labour cost (€/t)",
+    "Material cost (€/t)",
+    "Margin (€/t)",
+    "Carbon cost (€/t)",
+]
+
+
+@st.cache_data
+def build_cost_stack(df):
+    # Rebuilt only when the cost columns change, not on every rerun
+    return go.Figure(
+        [go.Bar(x=df["Country"], y=df[col], name=col) for col in COST_COLS],
+        layout=COST_STACK_LAYOUT,
     )
 
-    fig_map.update_layout(
-        margin={"r": 0, "t": 0, "l": 0, "b": 0},
-        coloraxis_colorbar=dict(title="€/t aluminium"),
+# =================================================
+# Layout — tabs
+# =================================================
+tab_map, tab_scenario, tab_costs = st.tabs(
+    ["🌍 Global map", "⚙️ Scenario outcomes", "💰 Cost structure"]
+)
+
+# =================================================
+# TAB — Global map
+# =================================================
+with tab_map:
+    st.markdown(
+        "<h3 style='font-size:1.25rem; margin:0 0 0.2rem 0;'>"
+        "Global overview of aluminium production metrics"
+        "</h3>",
+        unsafe_allow_html=True
     )
 
+    fig_map = build_choropleth(df[MAP_COLS])
     st.plotly_chart(fig_map, use_container_width=True)
 
 # =================================================
@@ -505,159 +722,60 @@ with tab_map:
 with tab_scenario:
     #st.subheader("Scenario outcomes")
 
-    fig1 = px.scatter(
+    fig1 = country_scatter(
         df,
         x="Electricity CO₂ footprint (kgCO₂/kWh)",
         y="Electricity price (€/kWh)",
-        color="Country",
         title="Electricity price vs Electricity CO₂ footprint (Grid)",
-        color_discrete_sequence=PALETTE
-    )
-    fig1.update_traces(
-        marker=dict(opacity=1.0,size=9),
-        selector=dict(mode="markers")
-    )
-    fig1.update_layout(
-        height=555,
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=1.0,
-            xanchor="left",
-            x=1.02,
-            font=dict(size=7)
-        )
+        marker_size=9,
     )
     st.plotly_chart(fig1, use_container_width=True)
 
-    fig2 = px.scatter(
+    fig2 = country_scatter(
         df,
         x="Electricity price (€/kWh)",
         y="Total cost (€/t)",
-        color="Country",
         title="Total production cost vs electricity price",
-        color_discrete_sequence=PALETTE
-    )
-    fig2.update_traces(
-        marker=dict(opacity=1.0,size=7),
-        selector=dict(mode="markers")
-    )
-    fig2.update_layout(
-        height=555,
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=1.0,
-            xanchor="left",
-            x=1.02,
-            font=dict(size=7)
-        )
+        marker_size=7,
     )
     st.plotly_chart(fig2, use_container_width=True)
 
-    fig3 = px.scatter(
+    fig3 = country_scatter(
         df,
         x="Total CO₂ footprint  (tCO₂/t Al)",
         y="Total cost (€/t)",
-        color="Country",
         title="Total production cost vs TOTAL CO₂ footprint",
-        color_discrete_sequence=PALETTE
-    )
-    fig3.update_traces(
-        marker=dict(opacity=1.0,size=9),
-        selector=dict(mode="markers")
-    )
-    fig3.update_layout(
-        height=555,
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=1.0,
-            xanchor="left",
-            x=1.02,
-            font=dict(size=7)
-        )
+        marker_size=9,
     )
     st.plotly_chart(fig3, use_container_width=True)
-    
-    
-    
-    fig4 = px.scatter(
+
+    fig4 = country_scatter(
         df,
         x="Electricity CO₂ footprint (kgCO₂/kWh)",
         y="Total CO₂ footprint  (tCO₂/t Al)",
-        color="Country",
         title="Total CO₂ footprint vs electricity CO₂ footprint (Grid)",
-        color_discrete_sequence=PALETTE
-        
-    )
-    fig4.update_traces(
-        marker=dict(opacity=1.0,size=6),
-        selector=dict(mode="markers")
-    )
-    fig4.update_layout(
-        height=555,
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=1.0,
-            xanchor="left",
-            x=1.02,
-            font=dict(size=7)
-        )
+        marker_size=6,
     )
     st.plotly_chart(fig4, use_container_width=True)
     ###########################################################################33
 
-    fig5 = px.scatter(
+    fig5 = country_scatter(
         df,
         x="Total Al (t)",
         y="Total CO₂ (t)",
-        color="Country",
         title="Total CO₂ emissions vs total aluminium (by country)",
-        color_discrete_sequence=PALETTE
-    )
-    fig5.update_traces(
-        marker=dict(opacity=1.0,size=6),
-        selector=dict(mode="markers")
-    )
-    fig5.update_layout(
-        height=555,
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=1.0,
-            xanchor="left",
-            x=1.02,
-            font=dict(size=7)
-        )
+        marker_size=6,
     )
     st.plotly_chart(fig5, use_container_width=True, key="total_co2_vs_total_al")
 
 
     ######################################################################################
-    fig6 = px.scatter(
+    fig6 = country_scatter(
         df,
         x="Total Al (t)",
         y="Total CO₂ footprint  (tCO₂/t Al)",
-        color="Country",
         title="CO₂ intensity vs total aluminium (by country)",
-        color_discrete_sequence=PALETTE
-    )
-    fig6.update_traces(
-        marker=dict(opacity=1.0,size=6),
-        selector=dict(mode="markers")
-    )
-    fig6.update_layout(
-        height=555,
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=1.0,
-            xanchor="left",
-            x=1.02,
-            font=dict(size=7)
-        )
+        marker_size=6,
     )
     st.plotly_chart(fig6, use_container_width=True, key="intensity_vs_total_al")
 
@@ -673,7 +791,7 @@ with tab_scenario:
 
 
 
-    row = df[df["Country"] == country_for_pie].iloc[0]
+    row = df.set_index("Country").loc[country_for_pie]
 
     pie_fig = px.pie(
         names=["Electricity", "Bauxite", "Anode", "Reaction"],
@@ -703,27 +821,10 @@ with tab_costs:
         unsafe_allow_html=True
     )
 
-    cost_cols = [
-        "Electricity cost (€/t)",
-        "Labour cost (€/t)",
-        "Material cost (€/t)",
-        "Margin (€/t)",
-        "Carbon cost (€/t)",
-    ]
-
-    fig = go.Figure()
-    for col in cost_cols:
-        fig.add_bar(x=df["Country"], y=df[col], name=col)
-
-    fig.update_layout(
-        barmode="stack",
-        margin={"r": 0, "t": 20, "l": 0, "b": 0},
-        yaxis_title="€/t aluminium",
-        xaxis_title="Country",
-    )
+    fig = build_cost_stack(df[["Country", *COST_COLS]])
 
     st.plotly_chart(fig, use_container_width=True)
-    st.dataframe(df.round(2), use_container_width=True)
+    st.dataframe(st.session_state["results_display_df"], use_container_width=True, hide_index=True)
 
 
 